@@ -0,0 +1,161 @@
+"""
+Document extraction and LLM analysis prompts shared by the server and the batch CLI.
+
+Importing this module has no side effects beyond loading .env; the LLM client is
+built on first use.
+"""
+import os
+from functools import lru_cache
+from langchain_community.document_loaders import PyPDFLoader
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_openai import  ChatOpenAI
+from langchain.chains import LLMChain
+from langchain.prompts import PromptTemplate
+
+#load openai api key from .env file
+from dotenv import load_dotenv
+load_dotenv()
+OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
+
+MODEL_NAME = "gpt-4-turbo"
+
+@lru_cache(maxsize=None)
+def get_llm():
+    return ChatOpenAI(model=MODEL_NAME,temperature=0,api_key=OPENAI_API_KEY)
+
+def process_pdf(file_path):
+    loader = PyPDFLoader(file_path)
+    documents = loader.load()
+    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
+    texts = text_splitter.split_documents(documents)
+    return texts
+
+def analyze_company(company_name: str, company_data: str) -> str:
+    prompt = PromptTemplate(
+        input_variables=["company_name", "company_data"],
+        template="""
+Analyze the following data for {company_name}. Provide a concise summary covering:
+1. Financial Performance
+2. Market Position
+3. Operational Efficiency
+4. Innovation and R&D
+5. Key Strengths and Weaknesses
+
+Data:
+{company_data}
+
+Provide a brief analysis in the following markdown table format:
+
+| Category | Analysis |
+| --- | --- |
+| Financial Performance | (analysis here) |
+| Market Position | (analysis here) |
+| Operational Efficiency | (analysis here) |
+| Innovation and R&D | (analysis here) |
+| Key Strengths | (analysis here) |
+| Key Weaknesses | (analysis here) |
+
+Ensure that the table is properly formatted with the | character at the start and end of each row, and that the separator row (| --- | --- |) is included.
+
+Analysis:
+"""
+    )
+    chain = LLMChain(llm=get_llm(), prompt=prompt)
+    return chain.run(company_name=company_name, company_data=company_data[:100000])  # Limit input to 100k characters
+
+def summarize_changes(company_name: str, changed_data: str, removed_pages: int) -> str:
+    prompt = PromptTemplate(
+        input_variables=["company_name", "changed_data", "removed_pages"],
+        template="""
+The following pages are new or amended in the latest version of a report for {company_name}.
+{removed_pages} page(s) of the previous version were removed.
+
+Changed pages:
+{changed_data}
+
+Summarize what these changes say about the company's Financial Performance, Market Position, Operational Efficiency, Innovation and R&D, Key Strengths and Key Weaknesses. Only mention categories that are affected.
+
+Summary of changes:
+"""
+    )
+    chain = LLMChain(llm=get_llm(), prompt=prompt)
+    return chain.run(company_name=company_name, changed_data=changed_data[:100000], removed_pages=removed_pages)
+
+def merge_analysis(company_name: str, previous_analysis: str, changes: str) -> str:
+    prompt = PromptTemplate(
+        input_variables=["company_name", "previous_analysis", "changes"],
+        template="""
+Below is an existing analysis of {company_name} and a summary of changes from an updated version of its report.
+
+Existing analysis:
+{previous_analysis}
+
+Changes:
+{changes}
+
+Update the existing analysis to reflect the changes. Keep rows that are unaffected as they are. Return the full analysis in the same markdown table format:
+
+| Category | Analysis |
+| --- | --- |
+| Financial Performance | (analysis here) |
+| Market Position | (analysis here) |
+| Operational Efficiency | (analysis here) |
+| Innovation and R&D | (analysis here) |
+| Key Strengths | (analysis here) |
+| Key Weaknesses | (analysis here) |
+
+Ensure that the table is properly formatted with the | character at the start and end of each row, and that the separator row (| --- | --- |) is included.
+
+Updated Analysis:
+"""
+    )
+    chain = LLMChain(llm=get_llm(), prompt=prompt)
+    return chain.run(company_name=company_name, previous_analysis=previous_analysis, changes=changes)
+
+COMPARISON_CATEGORIES = [
+    "Financial Performance",
+    "Market Position",
+    "Operational Efficiency",
+    "Innovation and R&D",
+    "Key Strengths",
+    "Key Weaknesses",
+]
+
+def compare_companies(company_analyses: dict) -> str:
+    """
+    Compare any number of companies. The table columns are built from the
+    company names, and recommendations are given for the first company.
+    """
+    names = [name.strip() for name in company_analyses]
+    table_format = "\n".join(
+        ["| Category | " + " | ".join(names) + " |"]
+        + ["| " + category + " | " + " | ".join(["(analysis)"] * len(names)) + " |" for category in COMPARISON_CATEGORIES]
+    )
+    separator = "| --- |" + " --- |" * len(names)
+    prompt = PromptTemplate(
+        input_variables=["analyses", "table_format", "separator", "focus_company"],
+        template="""
+Compare the following companies based on their individual analyses:
+
+{analyses}
+
+Provide a comprehensive comparative analysis in the following markdown table format:
+
+{table_format}
+Ensure that the table is properly formatted with the | character at the start and end of each row, and that the separator row ({separator}) is included.
+
+Then, provide strategic recommendations for {focus_company} in a separate markdown table:
+
+| Recommendation | Description |
+| Recommendation 1 | (description) |
+| Recommendation 2 | (description) |
+| Recommendation 3 | (description) |
+
+Again, ensure that this table is properly formatted with the | character at the start and end of each row, and that the separator row (| --- | --- |) is included.
+
+Comparative Analysis:
+"""
+    )
+    analyses_text = "\n\n".join([f"{name}:\n{analysis}" for name, analysis in company_analyses.items()])
+    chain = LLMChain(llm=get_llm(), prompt=prompt)
+    return chain.run(analyses=analyses_text, table_format=table_format, separator=separator, focus_company=names[0])
@@ -0,0 +1,261 @@
+"""
+Persistent store of company analyses and comparisons in a local SQLite file.
+
+Analyses are indexed by company name, document hash, model and date, and keep
+their page fingerprints so reissued reports can be matched to earlier versions.
+"""
+import os
+import json
+import uuid
+import sqlite3
+from datetime import datetime
+from typing import Optional
+from incremental import EMPTY_PAGE, MIN_MATCHED_PAGES, is_match, overlap
+
+ANALYSIS_DB = os.getenv("ANALYSIS_DB", "analyses.db")
+# Earlier versions scored in full when matching a new upload, best first
+MAX_MATCH_CANDIDATES = 20
+
+class AnalysisStore:
+    def __init__(self, path: str = ANALYSIS_DB):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS company_analyses (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    document_id TEXT NOT NULL,
+                    company_name TEXT NOT NULL,
+                    source_name TEXT,
+                    document_hash TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    page_count INTEGER NOT NULL,
+                    analysis TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_analyses_company ON company_analyses (company_name);
+                CREATE INDEX IF NOT EXISTS idx_analyses_source ON company_analyses (source_name, model);
+                CREATE INDEX IF NOT EXISTS idx_analyses_hash ON company_analyses (document_hash, model);
+                CREATE INDEX IF NOT EXISTS idx_analyses_model ON company_analyses (model);
+                CREATE INDEX IF NOT EXISTS idx_analyses_created ON company_analyses (created_at);
+
+                CREATE TABLE IF NOT EXISTS page_fingerprints (
+                    analysis_id INTEGER NOT NULL REFERENCES company_analyses (id),
+                    page INTEGER NOT NULL,
+                    fingerprint TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_fingerprints ON page_fingerprints (fingerprint);
+                CREATE INDEX IF NOT EXISTS idx_fingerprints_analysis ON page_fingerprints (analysis_id, page);
+
+                CREATE TABLE IF NOT EXISTS comparisons (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    model TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    companies TEXT NOT NULL,
+                    comparative_analysis TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_comparisons_companies ON comparisons (companies, model);
+                CREATE INDEX IF NOT EXISTS idx_comparisons_model ON comparisons (model);
+                CREATE INDEX IF NOT EXISTS idx_comparisons_created ON comparisons (created_at);
+                """
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _fingerprints(self, conn, analysis_id: int) -> list:
+        rows = conn.execute(
+            "SELECT fingerprint FROM page_fingerprints WHERE analysis_id = ? ORDER BY page",
+            (analysis_id,),
+        ).fetchall()
+        return [row["fingerprint"] for row in rows]
+
+    def save_analysis(self, company_name: str, document_hash: str, model: str, fingerprints: list,
+                      analysis: str, document_id: Optional[str] = None, source_name: Optional[str] = None) -> int:
+        """
+        Record an analysis. Pass the document_id of a previous version to link
+        the two as versions of the same document. source_name is the report's
+        file name, which later versions are matched on.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """INSERT INTO company_analyses
+                   (document_id, company_name, source_name, document_hash, model, created_at, page_count, analysis)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (document_id or uuid.uuid4().hex, company_name, source_name, document_hash, model,
+                 datetime.now().isoformat(), len(fingerprints), analysis),
+            )
+            conn.executemany(
+                "INSERT INTO page_fingerprints (analysis_id, page, fingerprint) VALUES (?, ?, ?)",
+                [(cursor.lastrowid, page, fingerprint) for page, fingerprint in enumerate(fingerprints)],
+            )
+            return cursor.lastrowid
+
+    def find_by_hash(self, document_hash: str, model: str, company_name: str) -> Optional[dict]:
+        """
+        Return the latest analysis of an identical file under the same company
+        name. The prompt includes the name, so an analysis written under another
+        name is not reused.
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                """SELECT * FROM company_analyses
+                   WHERE document_hash = ? AND model = ? AND company_name = ?
+                   ORDER BY id DESC LIMIT 1""",
+                (document_hash, model, company_name),
+            ).fetchone()
+            return dict(row, fingerprints=self._fingerprints(conn, row["id"])) if row else None
+
+    def find_by_fingerprints(self, fingerprints: list, model: str, source_name: str) -> Optional[dict]:
+        """
+        Return the earlier version of the report named source_name whose pages
+        overlap most with the given fingerprints, if it passes incremental.is_match.
+        """
+        if not fingerprints or not source_name:
+            return None
+        # Blank pages say nothing about identity, so they do not count towards a candidate
+        distinct = sorted(set(fingerprints) - {EMPTY_PAGE})
+        if len(distinct) < MIN_MATCHED_PAGES:
+            return None
+        placeholders = ", ".join("?" * len(distinct))
+        with self._connect() as conn:
+            # Only analyses sharing enough distinct pages are loaded and scored
+            candidates = conn.execute(
+                f"""SELECT f.analysis_id AS id FROM page_fingerprints f
+                    JOIN company_analyses a ON a.id = f.analysis_id
+                    WHERE a.model = ? AND a.source_name = ? AND f.fingerprint IN ({placeholders})
+                    GROUP BY f.analysis_id
+                    HAVING COUNT(DISTINCT f.fingerprint) >= ?
+                    ORDER BY COUNT(DISTINCT f.fingerprint) DESC, f.analysis_id DESC
+                    LIMIT ?""",
+                (model, source_name, *distinct, MIN_MATCHED_PAGES, MAX_MATCH_CANDIDATES),
+            ).fetchall()
+            best_id, best_fingerprints, best_overlap = None, None, 0.0
+            for row in candidates:
+                candidate_fingerprints = self._fingerprints(conn, row["id"])
+                if not is_match(candidate_fingerprints, fingerprints):
+                    continue
+                score = overlap(candidate_fingerprints, fingerprints)
+                if best_id is None or score > best_overlap:
+                    best_id, best_fingerprints, best_overlap = row["id"], candidate_fingerprints, score
+            if best_id is None:
+                return None
+            row = conn.execute("SELECT * FROM company_analyses WHERE id = ?", (best_id,)).fetchone()
+            return dict(row, fingerprints=best_fingerprints)
+
+    def get_analysis(self, analysis_id: int) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM company_analyses WHERE id = ?", (analysis_id,)).fetchone()
+            return dict(row) if row else None
+
+    def _page(self, table: str, where: list, params: list, limit: int, offset: int):
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM {table} {clause}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM {table} {clause} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return total, [dict(row) for row in rows]
+
+    def list_analyses(self, company_name: Optional[str] = None, source_name: Optional[str] = None,
+                      document_hash: Optional[str] = None, model: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None, limit: int = 20, offset: int = 0):
+        where, params = [], []
+        for column, value in (("company_name", company_name), ("source_name", source_name),
+                              ("document_hash", document_hash), ("model", model)):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        return self._page("company_analyses", where, params, limit, offset)
+
+    def search_analyses(self, query: str, limit: int = 20, offset: int = 0):
+        pattern = f"%{query}%"
+        return self._page(
+            "company_analyses", ["(company_name LIKE ? OR source_name LIKE ? OR analysis LIKE ?)"],
+            [pattern, pattern, pattern], limit, offset,
+        )
+
+    def save_comparison(self, companies: dict, model: str, comparative_analysis: str) -> int:
+        """
+        Record a comparison. `companies` maps each company name to the id of the
+        analysis the comparison was built from.
+        """
+        if any(analysis_id is None for analysis_id in companies.values()):
+            raise ValueError("Every company in a stored comparison needs a stored analysis")
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO comparisons (model, created_at, companies, comparative_analysis) VALUES (?, ?, ?, ?)",
+                (model, datetime.now().isoformat(), json.dumps(companies), comparative_analysis),
+            )
+            return cursor.lastrowid
+
+    def find_comparison(self, companies: dict, model: str) -> Optional[dict]:
+        if any(analysis_id is None for analysis_id in companies.values()):
+            return None
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM comparisons WHERE companies = ? AND model = ? ORDER BY id DESC LIMIT 1",
+                (json.dumps(companies), model),
+            ).fetchone()
+        return self._comparison(row) if row else None
+
+    def _comparison(self, row) -> dict:
+        return dict(row, companies=json.loads(row["companies"]))
+
+    def _with_sources(self, comparisons: list) -> list:
+        # List items name the report each company was analyzed from, without the analysis text
+        analysis_ids = sorted({analysis_id for comparison in comparisons for analysis_id in comparison["companies"].values()})
+        sources = {}
+        if analysis_ids:
+            placeholders = ", ".join("?" * len(analysis_ids))
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT id, source_name FROM company_analyses WHERE id IN ({placeholders})", analysis_ids
+                ).fetchall()
+            sources = {row["id"]: row["source_name"] for row in rows}
+        for comparison in comparisons:
+            comparison["sources"] = {
+                company_name: sources.get(analysis_id) for company_name, analysis_id in comparison["companies"].items()
+            }
+        return comparisons
+
+    def get_comparison(self, comparison_id: int) -> Optional[dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM comparisons WHERE id = ?", (comparison_id,)).fetchone()
+            if row is None:
+                return None
+            comparison = self._comparison(row)
+            comparison["individual_analyses"] = {}
+            for company_name, analysis_id in comparison["companies"].items():
+                analysis = conn.execute("SELECT analysis FROM company_analyses WHERE id = ?", (analysis_id,)).fetchone()
+                comparison["individual_analyses"][company_name] = analysis["analysis"] if analysis else None
+        return comparison
+
+    def list_comparisons(self, model: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+                         limit: int = 20, offset: int = 0):
+        where, params = [], []
+        if model is not None:
+            where.append("model = ?")
+            params.append(model)
+        if since is not None:
+            where.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("created_at < ?")
+            params.append(until)
+        total, rows = self._page("comparisons", where, params, limit, offset)
+        return total, self._with_sources([self._comparison(row) for row in rows])
+
+    def search_comparisons(self, query: str, limit: int = 20, offset: int = 0):
+        pattern = f"%{query}%"
+        total, rows = self._page("comparisons", ["(companies LIKE ? OR comparative_analysis LIKE ?)"], [pattern, pattern], limit, offset)
+        return total, self._with_sources([self._comparison(row) for row in rows])
@@ -129,6 +129,9 @@ uploaded_files = st.file_uploader("Upload exactly 4 PDF files", type="pdf", acce
 
 # API endpoint
 API_ENDPOINT = "http://localhost:8000/analyze-companies/"
+COMPARISONS_ENDPOINT = "http://localhost:8000/comparisons/"
+# History requests run on every rerun, so they must fail fast if the backend hangs
+HISTORY_TIMEOUT = 5
 
 def parse_markdown_table(markdown_content):
     lines = markdown_content.strip().split('\n')
@@ -152,6 +155,8 @@ def create_excel_report(result):
 
         # Individual company analyses
         for company_name, analysis in result["individual_analyses"].items():
+            if analysis is None:
+                continue
             df = parse_markdown_table(analysis)
             sheet_name = company_name[:31]  # Excel sheet names are limited to 31 characters
             df.to_excel(writer, sheet_name=sheet_name, index=False, startrow=1, header=False)
@@ -194,6 +199,79 @@ def get_table_download_link(df, filename):
     href = f'<a class="download-link" href="data:file/csv;base64,{b64}" download="{filename}">Download {filename}</a>'
     return href
 
+def display_result(result):
+    """Renders the individual and comparative analyses of an /analyze-companies/ result"""
+    st.header("Individual Company Analyses")
+    for i, (company_name, analysis) in enumerate(result["individual_analyses"].items()):
+        if analysis is None:
+            # A stored comparison whose analysis is no longer available
+            continue
+        with st.expander(f"{company_name} Analysis"):
+            st.markdown(f"<div class='animate-slide-in' style='animation-delay: {i * 0.1}s'>", unsafe_allow_html=True)
+            st.markdown(analysis)
+            df = parse_markdown_table(analysis)
+            st.markdown(get_table_download_link(df, f"{company_name}_analysis.csv"), unsafe_allow_html=True)
+            st.markdown("</div>", unsafe_allow_html=True)
+
+    incremental = result.get("incremental", {})
+    reused = {name: report for name, report in incremental.items() if report["mode"] != "full"}
+    if reused:
+        st.header("Updated Reports")
+        for company_name, report in reused.items():
+            with st.expander(f"{company_name}: {report['pages_changed']} of {report['pages_total']} pages changed"):
+                st.write(f"Pages skipped: {report['pages_skipped']}, pages removed: {report['pages_removed']}")
+                if report["changes"]:
+                    st.markdown(report["changes"])
+                else:
+                    st.write("No changes since the previous version; the stored analysis was reused.")
+
+    st.header("Comparative Analysis")
+    st.markdown("<div class='animate-slide-in'>", unsafe_allow_html=True)
+    st.markdown(result["comparative_analysis"])
+    comp_df = parse_markdown_table(result["comparative_analysis"])
+    st.markdown(get_table_download_link(comp_df, "comparative_analysis.csv"), unsafe_allow_html=True)
+    st.markdown("</div>", unsafe_allow_html=True)
+
+    excel_report = create_excel_report(result)
+    st.download_button(
+        label="Download Excel Report",
+        data=excel_report,
+        file_name="company_analysis_report.xlsx",
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+@st.cache_data(ttl=30)
+def fetch_comparison_history(limit=20):
+    response = requests.get(COMPARISONS_ENDPOINT, params={"limit": limit}, timeout=HISTORY_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["items"]
+
+# Past comparisons are served from the analysis store
+st.sidebar.title("Past Comparisons")
+try:
+    history = fetch_comparison_history()
+except Exception as e:
+    logger.warning(f"Could not load comparison history: {str(e)}")
+    history = []
+if history:
+    labels = {
+        f"#{item['id']} - {item['created_at'][:16].replace('T', ' ')} - "
+        f"{', '.join(source or name for name, source in item['sources'].items())}": item["id"]
+        for item in history
+    }
+    selected = st.sidebar.selectbox("Select a comparison", list(labels))
+    if st.sidebar.button("Load Comparison"):
+        try:
+            response = requests.get(f"{COMPARISONS_ENDPOINT}{labels[selected]}", timeout=HISTORY_TIMEOUT)
+            if response.status_code == 200:
+                st.session_state.result = response.json()
+            else:
+                st.sidebar.error(f"Error: {response.status_code} - {response.text}")
+        except Exception as e:
+            st.sidebar.error(f"Could not load comparison: {str(e)}")
+else:
+    st.sidebar.info("No stored comparisons yet.")
+
 if uploaded_files and len(uploaded_files) == 4:
     files = [("files", (file.name, file.getvalue(), "application/pdf")) for file in uploaded_files]
     
@@ -208,30 +286,9 @@ if uploaded_files and len(uploaded_files) == 4:
                     logger.info("Analysis completed successfully")
                     
                     st.success("Analysis completed successfully!")
-                    
-                    st.header("Individual Company Analyses")
-                    for i, (company_name, analysis) in enumerate(result["individual_analyses"].items()):
-                        with st.expander(f"{company_name} Analysis"):
-                            st.markdown(f"<div class='animate-slide-in' style='animation-delay: {i * 0.1}s'>", unsafe_allow_html=True)
-                            st.markdown(analysis)
-                            df = parse_markdown_table(analysis)
-                            st.markdown(get_table_download_link(df, f"{company_name}_analysis.csv"), unsafe_allow_html=True)
-                            st.markdown("</div>", unsafe_allow_html=True)
-                    
-                    st.header("Comparative Analysis")
-                    st.markdown("<div class='animate-slide-in'>", unsafe_allow_html=True)
-                    st.markdown(result["comparative_analysis"])
-                    comp_df = parse_markdown_table(result["comparative_analysis"])
-                    st.markdown(get_table_download_link(comp_df, "comparative_analysis.csv"), unsafe_allow_html=True)
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    
-                    excel_report = create_excel_report(result)
-                    st.download_button(
-                        label="Download Excel Report",
-                        data=excel_report,
-                        file_name="company_analysis_report.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
+                    # Keep the result across reruns
+                    st.session_state.result = result
+                    fetch_comparison_history.clear()
                 else:
                     logger.error(f"API Error: {response.status_code} - {response.text}")
                     st.error(f"Error: {response.status_code} - {response.text}")
@@ -244,6 +301,9 @@ elif uploaded_files:
 else:
     st.info("Please upload the PDF files to begin.")
 
+if "result" in st.session_state:
+    display_result(st.session_state.result)
+
 # Instructions
 st.markdown("---")
 st.subheader("How to use this tool:")
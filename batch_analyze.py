@@ -0,0 +1,313 @@
+"""
+Offline batch analysis of company reports.
+
+Input is either a directory or a JSON manifest:
+
+- Directory: each sub-directory is a peer group and each PDF inside it is a
+  company (named after the file). PDFs at the top level are analyzed but not compared.
+- Manifest:
+    {
+      "companies": [{"name": "Acme", "path": "reports/acme.pdf"}, ...],
+      "peer_groups": [{"name": "Retail", "companies": ["Acme", ...]}, ...]
+    }
+
+Per-company analyses and peer group comparisons are checkpointed under
+<output>/checkpoints, so rerunning the same command resumes an interrupted sweep.
+
+    python batch_analyze.py reports/ --output sweep-q3 --concurrency 4 --rate-limit 30
+"""
+import os
+import re
+import json
+import time
+import argparse
+import logging
+import hashlib
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import pandas as pd
+from pypdf import PdfReader
+from analysis import MODEL_NAME, process_pdf, analyze_company, compare_companies
+from analysis_store import AnalysisStore
+from incremental import fingerprint_pages
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Spaces out call starts so that at most `per_minute` calls begin each minute.
+    """
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+def slugify(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "unnamed"
+
+def check_unique(kind: str, names: list):
+    """
+    Reject repeated names, and names that map to the same checkpoint file.
+    """
+    seen = {}
+    for name in names:
+        slug = slugify(name)
+        if slug in seen:
+            if seen[slug] == name:
+                raise ValueError(f"Duplicate {kind} name: {name}")
+            raise ValueError(f"{kind.capitalize()} names {seen[slug]!r} and {name!r} are too similar to checkpoint separately")
+        seen[slug] = name
+
+def load_jobs(source: str):
+    """
+    Return (companies, peer_groups) where companies maps name -> pdf path and
+    peer_groups maps group name -> list of company names.
+    """
+    if os.path.isdir(source):
+        company_list, group_list = [], []
+        for entry in sorted(os.listdir(source)):
+            path = os.path.join(source, entry)
+            if os.path.isdir(path):
+                members = []
+                for file_name in sorted(os.listdir(path)):
+                    if file_name.lower().endswith(".pdf"):
+                        name = os.path.splitext(file_name)[0]
+                        company_list.append((name, os.path.join(path, file_name)))
+                        members.append(name)
+                if members:
+                    group_list.append((entry, members))
+            elif entry.lower().endswith(".pdf"):
+                company_list.append((os.path.splitext(entry)[0], path))
+    else:
+        with open(source) as f:
+            manifest = json.load(f)
+        base_dir = os.path.dirname(os.path.abspath(source))
+        company_list = [
+            (company["name"], os.path.join(base_dir, company["path"]))
+            for company in manifest.get("companies", [])
+        ]
+        group_list = [(group["name"], group["companies"]) for group in manifest.get("peer_groups", [])]
+
+    # In directory mode the same file name in two peer groups would otherwise collapse
+    # into one company; use a manifest to put one company in several peer groups.
+    check_unique("company", [name for name, _ in company_list])
+    check_unique("peer group", [name for name, _ in group_list])
+    unreadable = [f"{name} ({path})" for name, path in company_list
+                  if not (os.path.isfile(path) and os.access(path, os.R_OK))]
+    if unreadable:
+        raise ValueError("Missing or unreadable reports:\n  " + "\n  ".join(unreadable))
+    companies = dict(company_list)
+    peer_groups = dict(group_list)
+    for group_name, members in peer_groups.items():
+        missing = [name for name in members if name not in companies]
+        if missing:
+            raise ValueError(f"Peer group {group_name} references unknown companies: {', '.join(missing)}")
+    return companies, peer_groups
+
+def document_hash(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def extract_text(path: str):
+    # Runs in a worker process
+    texts = process_pdf(path)
+    try:
+        fingerprints = fingerprint_pages(PdfReader(path))
+    except Exception:
+        # The text was extracted, so the report can still be analyzed; it just cannot be matched later
+        fingerprints = []
+    return "\n".join([doc.page_content for doc in texts]), len(texts), fingerprints
+
+def read_checkpoint(path: str):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return None
+
+def write_checkpoint(path: str, record: dict):
+    # Write to a temp file first so an interrupted run never leaves a partial checkpoint
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(record, f)
+    os.replace(temp_path, path)
+
+def write_excel_report(path: str, company_records: list, comparison_records: list):
+    with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+        pd.DataFrame(
+            [{"Company": r["company"], "Source": r["source"], "Analysis": r["analysis"]} for r in company_records],
+            columns=["Company", "Source", "Analysis"],
+        ).to_excel(writer, sheet_name="Company Analyses", index=False)
+        pd.DataFrame(
+            [{"Peer Group": r["peer_group"], "Companies": ", ".join(r["companies"]), "Comparative Analysis": r["comparative_analysis"]} for r in comparison_records],
+            columns=["Peer Group", "Companies", "Comparative Analysis"],
+        ).to_excel(writer, sheet_name="Peer Comparisons", index=False)
+
+def run(args):
+    try:
+        companies, peer_groups = load_jobs(args.source)
+    except ValueError as e:
+        logger.error(str(e))
+        return 2
+    analysis_store = AnalysisStore()
+    company_dir = os.path.join(args.output, "checkpoints", "companies")
+    comparison_dir = os.path.join(args.output, "checkpoints", "comparisons")
+    os.makedirs(company_dir, exist_ok=True)
+    os.makedirs(comparison_dir, exist_ok=True)
+
+    # Checkpoints are keyed on the source file contents as well as the name, so a
+    # replaced report is analyzed again rather than resumed from its old result.
+    hashes = {name: document_hash(path) for name, path in companies.items()}
+
+    def company_checkpoint(name):
+        return os.path.join(company_dir, f"{slugify(name)}-{hashes[name][:16]}.json")
+
+    def comparison_checkpoint(group_name):
+        members = json.dumps([[name, hashes[name]] for name in peer_groups[group_name]])
+        members_hash = hashlib.sha256(members.encode()).hexdigest()
+        return os.path.join(comparison_dir, f"{slugify(group_name)}-{members_hash[:16]}.json")
+
+    start = time.perf_counter()
+    stats = {"resumed": 0, "stored": 0, "analyzed": 0, "failed": 0, "chunks": 0, "compared": 0}
+    limiter = RateLimiter(args.rate_limit)
+    pending = []
+    for name in companies:
+        if os.path.exists(company_checkpoint(name)):
+            stats["resumed"] += 1
+            continue
+        # Reports analyzed before, by this tool or the server, come from the analysis store
+        hash_value = hashes[name]
+        stored = analysis_store.find_by_hash(hash_value, MODEL_NAME, name)
+        if stored is not None:
+            write_checkpoint(company_checkpoint(name), {
+                "type": "company",
+                "company": name,
+                "source": companies[name],
+                "analysis_id": stored["id"],
+                "analysis": stored["analysis"],
+            })
+            stats["stored"] += 1
+        else:
+            pending.append((name, hash_value))
+    logger.info(f"{len(companies)} companies, {stats['resumed']} already checkpointed, "
+                f"{stats['stored']} found in the analysis store, {len(pending)} to analyze")
+
+    def analyze(name, hash_value, text, fingerprints):
+        limiter.wait()
+        analysis = analyze_company(name, text)
+        analysis_id = analysis_store.save_analysis(
+            name, hash_value, MODEL_NAME, fingerprints, analysis, source_name=os.path.basename(companies[name])
+        )
+        write_checkpoint(company_checkpoint(name), {
+            "type": "company",
+            "company": name,
+            "source": companies[name],
+            "analysis_id": analysis_id,
+            "analysis": analysis,
+        })
+        return name
+
+    # Extraction is CPU-bound and runs in a process pool; the LLM calls are
+    # I/O-bound and run in a thread pool as soon as each document is extracted.
+    with ProcessPoolExecutor(max_workers=args.workers) as extract_pool, \
+            ThreadPoolExecutor(max_workers=args.concurrency) as analysis_pool:
+        extractions = {extract_pool.submit(extract_text, companies[name]): (name, hash_value) for name, hash_value in pending}
+        analyses = {}
+        for future in as_completed(extractions):
+            name, hash_value = extractions.pop(future)
+            try:
+                text, chunk_count, fingerprints = future.result()
+            except Exception as e:
+                logger.error(f"Error extracting {companies[name]}: {str(e)}")
+                stats["failed"] += 1
+                continue
+            stats["chunks"] += chunk_count
+            analyses[name] = analysis_pool.submit(analyze, name, hash_value, text, fingerprints)
+            # The analysis task holds the only remaining reference to the text
+            del text
+
+        for name, future in analyses.items():
+            try:
+                future.result()
+                stats["analyzed"] += 1
+                logger.info(f"Analyzed {name}")
+            except Exception as e:
+                logger.error(f"Error analyzing {name}: {str(e)}")
+                stats["failed"] += 1
+
+        def compare(group_name, members):
+            records = {name: read_checkpoint(company_checkpoint(name)) for name in members}
+            analysis_ids = {name: record["analysis_id"] for name, record in records.items()}
+            comparison = analysis_store.find_comparison(analysis_ids, MODEL_NAME)
+            if comparison is not None:
+                comparison_id = comparison["id"]
+                comparative_analysis = comparison["comparative_analysis"]
+            else:
+                limiter.wait()
+                comparative_analysis = compare_companies({name: record["analysis"] for name, record in records.items()})
+                comparison_id = analysis_store.save_comparison(analysis_ids, MODEL_NAME, comparative_analysis)
+            write_checkpoint(comparison_checkpoint(group_name), {
+                "type": "comparison",
+                "peer_group": group_name,
+                "companies": members,
+                "comparison_id": comparison_id,
+                "comparative_analysis": comparative_analysis,
+            })
+
+        comparisons = {}
+        for group_name, members in peer_groups.items():
+            if os.path.exists(comparison_checkpoint(group_name)):
+                continue
+            if not all(os.path.exists(company_checkpoint(name)) for name in members):
+                logger.warning(f"Skipping peer group {group_name}: not every company was analyzed")
+                continue
+            comparisons[group_name] = analysis_pool.submit(compare, group_name, members)
+
+        for group_name, future in comparisons.items():
+            try:
+                future.result()
+                stats["compared"] += 1
+                logger.info(f"Compared peer group {group_name}")
+            except Exception as e:
+                logger.error(f"Error comparing peer group {group_name}: {str(e)}")
+                stats["failed"] += 1
+
+    company_records = [r for r in (read_checkpoint(company_checkpoint(name)) for name in companies) if r]
+    comparison_records = [r for r in (read_checkpoint(comparison_checkpoint(name)) for name in peer_groups) if r]
+    with open(os.path.join(args.output, "results.jsonl"), "w") as f:
+        for record in company_records + comparison_records:
+            f.write(json.dumps(record) + "\n")
+    write_excel_report(os.path.join(args.output, "results.xlsx"), company_records, comparison_records)
+
+    elapsed = time.perf_counter() - start
+    rate = stats["analyzed"] / elapsed * 60 if elapsed else 0
+    print(f"Companies: {len(company_records)}/{len(companies)} done "
+          f"({stats['analyzed']} analyzed, {stats['resumed']} resumed from checkpoint, "
+          f"{stats['stored']} reused from the analysis store)")
+    print(f"Peer groups: {len(comparison_records)}/{len(peer_groups)} done ({stats['compared']} compared)")
+    print(f"Failures: {stats['failed']}")
+    print(f"Chunks extracted: {stats['chunks']}")
+    print(f"Elapsed: {elapsed:.1f}s, {rate:.1f} companies/min")
+    return 1 if stats["failed"] else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze and compare company reports offline")
+    parser.add_argument("source", help="Directory of reports or JSON manifest")
+    parser.add_argument("--output", default="batch_output", help="Directory for checkpoints and results")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Processes used for PDF extraction")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent LLM calls")
+    parser.add_argument("--rate-limit", type=float, default=60, help="Maximum LLM calls started per minute (0 for no limit)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level)
+    raise SystemExit(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import os
+import asyncio
+import sqlite3
+import uuid
+import logging
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from langchain_openai import ChatOpenAI
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from nemoguardrails import LLMRails, RailsConfig
+import autogen
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+#load openai api key from .env file
+from dotenv import load_dotenv
+load_dotenv()
+OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
+os.environ["TOKENIZERS_PARALLELISM"] = "false"
+
+# Number of LLMRails instances kept per agent type
+RAILS_POOL_SIZE = int(os.getenv("CHAT_RAILS_POOL_SIZE", "4"))
+# SQLite file holding chat sessions
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB", "chat_sessions.db")
+# Set CHAT_STUB_LLM=1 to run against a canned LLM (load testing, no API calls)
+CHAT_STUB_LLM = os.getenv("CHAT_STUB_LLM", "0") == "1"
+CHAT_STUB_LATENCY = float(os.getenv("CHAT_STUB_LATENCY", "0.5"))
+
+def get_llm():
+    if CHAT_STUB_LLM:
+        return FakeListChatModel(responses=["general stub response"], sleep=CHAT_STUB_LATENCY)
+    return ChatOpenAI(model="gpt-4o",temperature=0,api_key=OPENAI_API_KEY)
+
+llm = get_llm()
+
+LEGAL_CONFIG = """
+
+
+
+define flow
+    user ask legal question
+    bot provide legal information
+
+define bot refuse illegal request
+    "I'm not able to assist with requests related to illegal activities. Is there a legal matter I can help you with instead?"
+
+define user input is blocked
+    contains "illegal activities"
+    contains abusive language
+    contains harsh language
+    contains "jailbreak"
+
+define bot response is blocked
+    contains "encourage illegal activities"
+    contains abusive language
+    contains harsh language
+    contains "jailbreak"
+
+"""
+
+FINANCIAL_CONFIG = """
+
+define flow
+    user ask financial question
+    bot provide financial information
+
+define bot refuse illegal request
+    "I'm not able to assist with requests related to illegal financial activities. Is there a legal financial matter I can help you with instead?"
+
+define user input is blocked
+    contains "illegal financial activities"
+    contains "money laundering"
+    contains abusive language
+    contains harsh language
+    contains "jailbreak"
+
+define bot response is blocked
+    contains "tax evasion strategies"
+    contains abusive language
+    contains harsh language
+    contains "jailbreak"
+"""
+
+GENERAL_CONFIG = """
+
+define flow
+    user ask general question
+    bot provide general information
+
+define bot refuse illegal request
+    "I'm not able to assist with requests related to illegal activities. Is there another topic I can help you with instead?"
+
+define user input is blocked
+    contains "illegal activities"
+    contains abusive language
+    contains harsh language
+    contains "jailbreak"
+
+
+define bot response is blocked
+    contains "instructions for illegal activities"
+    contains abusive language
+    contains harsh language
+    contains "jailbreak"
+"""
+
+RAILS_CONFIGS = {
+    "legal": LEGAL_CONFIG,
+    "financial": FINANCIAL_CONFIG,
+    "general": GENERAL_CONFIG,
+}
+
+class RailsPool:
+    """
+    Fixed-size pool of LLMRails objects per agent type.
+
+    Building LLMRails is expensive, and a single instance should only serve one
+    generation at a time, so requests borrow an instance and hand it back when done.
+    """
+    def __init__(self, configs: dict, llm, size: int):
+        self._pools = {}
+        for agent_type, content in configs.items():
+            rails_config = RailsConfig.from_content(content)
+            pool = asyncio.Queue()
+            for _ in range(size):
+                pool.put_nowait(LLMRails(rails_config, llm=llm))
+            self._pools[agent_type] = pool
+
+    async def generate(self, agent_type: str, messages: list):
+        pool = self._pools[agent_type]
+        rails = await pool.get()
+        try:
+            return await rails.generate_async(messages=messages)
+        finally:
+            pool.put_nowait(rails)
+
+class SessionStore:
+    """
+    Chat history keyed by session id, kept in a local SQLite file.
+
+    Calls block on sqlite3, so the endpoints run them in the threadpool.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    agent TEXT,
+                    created_at TEXT NOT NULL
+                )"""
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path)
+
+    def append_turn(self, session_id: str, user_message: str, assistant_response: str, agent: str):
+        """
+        Record a user message and its response together, so a failed turn leaves no trace.
+        """
+        created_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO messages (session_id, role, content, agent, created_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (session_id, "user", user_message, None, created_at),
+                    (session_id, "assistant", assistant_response, agent, created_at),
+                ],
+            )
+
+    def get(self, session_id: str) -> list:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT role, content, agent FROM messages WHERE session_id = ? ORDER BY id",
+                (session_id,),
+            ).fetchall()
+        messages = []
+        for role, content, agent in rows:
+            message = {"role": role, "content": content}
+            if agent:
+                message["agent"] = agent
+            messages.append(message)
+        return messages
+
+    def delete(self, session_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+rails_pool: Optional[RailsPool] = None
+session_store: Optional[SessionStore] = None
+
+async def get_response(user_input: str, agent_type: str) -> str:
+    """
+    Generate a response using a pooled guarded LLM for the specified agent type.
+    """
+    try:
+        response = await rails_pool.generate(agent_type, [{"role": "user", "content": user_input}])
+        if isinstance(response, dict) and "content" in response:
+            return response["content"]
+        elif isinstance(response, str):
+            return response
+        else:
+            return "I apologize, but I couldn't generate a proper response."
+    except Exception as e:
+        logger.error(f"An error occurred while generating a response: {str(e)}")
+        return "I'm sorry, but I encountered an error while processing your request. Please try again later."
+
+# AutoGen agent configurations
+config_list = [
+    {
+        "model": "gpt-4o",
+        "api_key": OPENAI_API_KEY,
+
+    }
+]
+
+# The agents never call autogen's own client, so skip building it when stubbed
+llm_config = False if CHAT_STUB_LLM else {
+    "config_list": config_list,
+    "temperature": 0,
+}
+
+class LegalAgent(autogen.AssistantAgent):
+    def __init__(self):
+        description = "Expertise in legal matters, including laws, regulations, legal concepts, and general legal information. Can handle questions about legal rights, contract law, legal implications, and legal terminology."
+        super().__init__(
+            name="LegalAgent",
+            system_message="""You are an advanced legal assistant with expertise in various areas of law. Your role is to provide accurate, up-to-date general legal information while adhering to ethical guidelines. You should:
+
+1. Offer comprehensive explanations of legal concepts, laws, and regulations.
+2. Provide context and background for legal issues, including historical developments and current trends.
+3. Explain potential legal implications of actions or situations.
+4. Clarify legal terminology and processes.
+5. Discuss general legal principles and how they might apply in various scenarios.
+6. Offer information on legal resources and where to find more detailed information.
+7. Emphasize the importance of consulting with a qualified attorney for specific legal advice.
+8. Avoid giving specific legal advice or making predictions about case outcomes.
+9. Maintain objectivity and avoid personal opinions on laws or legal matters.
+10. Respect confidentiality and privacy in all discussions.
+
+Remember, your purpose is to inform and educate, not to replace professional legal counsel.""",
+            llm_config=llm_config,
+        )
+        self.description = description
+
+    async def a_generate_reply(self, messages=None, sender=None, **kwargs):
+        user_message = messages[-1]['content']
+        return await get_response(user_message, "legal")
+
+class FinancialAgent(autogen.AssistantAgent):
+    def __init__(self):
+        description = "Expertise in financial matters, including economics, investments, budgeting, and financial planning. Can handle questions about financial concepts, market trends, economic indicators, and general money management strategies."
+        super().__init__(
+            name="FinancialAgent",
+            system_message="""You are a sophisticated financial assistant with broad knowledge across various financial domains. Your role is to provide accurate, up-to-date general financial information while maintaining ethical standards. You should:
+
+1. Offer comprehensive explanations of financial concepts, instruments, and markets.
+2. Provide context and background for financial issues, including historical trends and current market conditions.
+3. Explain potential financial implications of decisions or economic events.
+4. Clarify financial terminology and processes.
+5. Discuss general financial principles and how they might apply in various scenarios.
+6. Offer information on financial planning, budgeting, and money management strategies.
+7. Provide insights on economic indicators and their potential impacts.
+8. Emphasize the importance of consulting with a qualified financial advisor for specific financial advice.
+9. Avoid giving specific investment advice or making predictions about market performance.
+10. Maintain objectivity and avoid personal opinions on financial products or strategies.
+11. Respect confidentiality and privacy in all financial discussions.
+
+Remember, your purpose is to inform and educate, not to replace professional financial advisors.""",
+            llm_config=llm_config,
+        )
+        self.description = description
+
+    async def a_generate_reply(self, messages=None, sender=None, **kwargs):
+        user_message = messages[-1]['content']
+        return await get_response(user_message, "financial")
+
+class GeneralKnowledgeAgent(autogen.AssistantAgent):
+    def __init__(self):
+        description = "Broad expertise in various fields including science, history, culture, technology, and current events. Can handle general knowledge questions on a wide range of topics not specifically related to law or finance."
+        super().__init__(
+            name="GeneralKnowledgeAgent",
+            system_message="""You are a versatile general knowledge assistant with a broad understanding of various topics. Your role is to provide accurate, up-to-date information on a wide range of subjects. You should:
+
+1. Offer comprehensive explanations on diverse topics, from science and history to culture and technology.
+2. Provide context and background information to help users understand complex subjects.
+3. Explain concepts in clear, accessible language while maintaining accuracy.
+4. Offer multiple perspectives on topics when appropriate, especially for complex or debated issues.
+5. Cite reputable sources or general consensus when providing information.
+6. Clarify common misconceptions or myths related to various topics.
+7. Encourage critical thinking and further exploration of subjects.
+8. Admit when a topic is outside your knowledge base and suggest seeking specialized expertise.
+9. Avoid personal opinions or biases, sticking to factual information.
+10. Respect cultural sensitivities and maintain neutrality on controversial topics.
+
+Remember, your purpose is to inform and educate on a broad spectrum of general knowledge topics.""",
+            llm_config=llm_config,
+        )
+        self.description = description
+
+    async def a_generate_reply(self, messages=None, sender=None, **kwargs):
+        user_message = messages[-1]['content']
+        return await get_response(user_message, "general")
+
+class Orchestrator(autogen.AssistantAgent):
+    def __init__(self, agents: dict):
+        super().__init__(
+            name="Orchestrator",
+            system_message="""You are an intelligent orchestrator designed to analyze user queries and determine whether they are primarily legal, financial, or general in nature. Your role is crucial in directing users to the most appropriate specialized agent. When evaluating queries:
+
+1. Carefully analyze the core subject matter of the query.
+2. Identify key terms or concepts that indicate a legal, financial, or general knowledge focus.
+3. Consider the context and potential implications of the query.
+4. If a query contains multiple elements, determine which aspect is more prominent or central to the user's question.
+5. Be prepared to route general knowledge questions to the General Knowledge Agent.
+6. In cases of ambiguity, consider which specialized agent would be best equipped to provide the most relevant and helpful information.
+7. Be prepared to ask for clarification if the nature of the query is unclear.
+
+Your goal is to ensure that users receive the most accurate and relevant information by connecting them with the appropriate specialized agent.""",
+            llm_config=llm_config,
+        )
+        self.agents = agents
+
+    async def a_generate_reply(self, messages=None, sender=None, **kwargs):
+        user_message = messages[-1]['content']
+        prompt = f"""Analyze the following query and determine whether it is primarily legal, financial, or general in nature:
+
+Query: {user_message}
+
+Consider the following agent descriptions:
+
+1. Legal Agent: {self.agents["legal"].description}
+2. Financial Agent: {self.agents["financial"].description}
+3. General Knowledge Agent: {self.agents["general"].description}
+
+Based on these descriptions and the query, determine which agent would be best suited to answer the question.
+
+Respond with either 'legal', 'financial', or 'general', followed by a brief explanation of your reasoning."""
+
+        response = await llm.ainvoke([{"role": "user", "content": prompt}])
+        classification = response.content.strip().lower().split()[0]
+        return classification
+
+# Initialize agents
+agents = {
+    "legal": LegalAgent(),
+    "financial": FinancialAgent(),
+    "general": GeneralKnowledgeAgent(),
+}
+orchestrator = Orchestrator(agents)
+
+AGENT_NAMES = {
+    "legal": "Legal",
+    "financial": "Financial",
+    "general": "General Knowledge",
+}
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+@router.on_event("startup")
+async def init_chat_service():
+    # Built inside the running event loop so the pool queues bind to it
+    global rails_pool, session_store
+    logger.debug(f"Building rails pool with {RAILS_POOL_SIZE} instances per agent...")
+    rails_pool = RailsPool(RAILS_CONFIGS, llm, RAILS_POOL_SIZE)
+    session_store = SessionStore(CHAT_SESSION_DB)
+
+@router.get("/health/chat")
+async def chat_health():
+    return {"status": "ok", "rails_pool_size": RAILS_POOL_SIZE}
+
+@router.post("/chat")
+async def chat(request: ChatRequest):
+    session_id = request.session_id or uuid.uuid4().hex
+
+    try:
+        # Determine the appropriate agent
+        agent_type = await orchestrator.a_generate_reply([{"role": "user", "content": request.message}])
+    except Exception as e:
+        logger.error(f"Error during routing: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error during routing: {str(e)}")
+
+    if agent_type in agents:
+        agent_name = AGENT_NAMES[agent_type]
+        assistant_response = await agents[agent_type].a_generate_reply([{"role": "user", "content": request.message}])
+    else:
+        agent_name = "Orchestrator"
+        assistant_response = "I'm not sure how to categorize this question. Could you please provide more context or rephrase it?"
+
+    await run_in_threadpool(session_store.append_turn, session_id, request.message, assistant_response, agent_name)
+    return {
+        "session_id": session_id,
+        "agent": agent_name,
+        "response": assistant_response
+    }
+
+@router.get("/chat/{session_id}")
+async def get_session(session_id: str):
+    return {"session_id": session_id, "messages": await run_in_threadpool(session_store.get, session_id)}
+
+@router.delete("/chat/{session_id}")
+async def reset_session(session_id: str):
+    await run_in_threadpool(session_store.delete, session_id)
+    return {"message": "Session reset successfully"}
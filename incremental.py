@@ -0,0 +1,108 @@
+"""
+Page fingerprints for incremental re-analysis of reissued reports.
+
+Each page is fingerprinted from its raw, undecoded content stream together with the
+resources it draws (images, form XObjects and fonts), so unchanged pages can be
+recognised without extracting their text. A new upload is matched to an earlier
+version of the same document by the pages they have in common; only pages whose
+fingerprints are new need to be extracted and summarized.
+"""
+import os
+import hashlib
+from collections import Counter
+from pypdf import PdfReader
+
+# Minimum share of pages two versions must have in common to count as the same document
+MATCH_THRESHOLD = float(os.getenv("INCREMENTAL_MATCH_THRESHOLD", "0.5"))
+# Minimum number of distinct, non-blank pages two versions must share
+MIN_MATCHED_PAGES = int(os.getenv("INCREMENTAL_MIN_MATCHED_PAGES", "3"))
+
+# Fingerprint of a page with no content and no resources
+EMPTY_PAGE = hashlib.sha256(b"").hexdigest()
+
+def _raw_data(stream) -> bytes:
+    # Streams are hashed as stored: decoding is slow for images and fails on
+    # filters pypdf cannot decode, and the encoded bytes identify them as well
+    return getattr(stream, "_data", b"") or b""
+
+def _hash_xobject(xobject_ref, cache: dict) -> str:
+    # Images and forms are usually shared across pages, so hash each object once
+    key = getattr(xobject_ref, "idnum", None)
+    if key is not None and key in cache:
+        return cache[key]
+    xobject = xobject_ref.get_object()
+    digest = hashlib.sha256(_raw_data(xobject))
+    if key is not None:
+        cache[key] = ""  # guards against forms that reference themselves
+    if xobject.get("/Subtype") == "/Form":
+        _hash_resources(digest, xobject.get("/Resources"), cache)
+    result = digest.hexdigest()
+    if key is not None:
+        cache[key] = result
+    return result
+
+def _hash_resources(digest, resources, cache: dict):
+    if resources is None:
+        return
+    resources = resources.get_object()
+    xobjects = resources.get("/XObject")
+    if xobjects is not None:
+        xobjects = xobjects.get_object()
+        for name in sorted(xobjects):
+            digest.update(f"{name}={_hash_xobject(xobjects[name], cache)}\0".encode())
+    fonts = resources.get("/Font")
+    if fonts is not None:
+        fonts = fonts.get_object()
+        for name in sorted(fonts):
+            font = fonts[name].get_object()
+            digest.update(f"{name}={font.get('/BaseFont', '')}\0".encode())
+
+def fingerprint_pages(reader: PdfReader) -> list:
+    fingerprints = []
+    cache = {}
+    for page in reader.pages:
+        digest = hashlib.sha256()
+        contents = page.get("/Contents")
+        if contents is not None:
+            contents = contents.get_object()
+            # /Contents is either one stream or an array of streams
+            for stream in (contents if isinstance(contents, list) else [contents]):
+                digest.update(_raw_data(stream.get_object()))
+        _hash_resources(digest, page.get("/Resources"), cache)
+        fingerprints.append(digest.hexdigest())
+    return fingerprints
+
+def extract_pages(reader: PdfReader, indices: list) -> str:
+    return "\n".join([f"[Page {i + 1}]\n{reader.pages[i].extract_text()}" for i in indices])
+
+def diff_pages(old_fingerprints: list, new_fingerprints: list):
+    """
+    Return the indices of pages in the new version that are not in the old one,
+    and the number of old pages that no longer appear. Matching is by content
+    rather than position, so inserted or reordered pages are not counted as changes.
+    Repeated pages are counted individually, so dropping one copy counts as a removal.
+    """
+    remaining = Counter(old_fingerprints)
+    changed = []
+    for i, fingerprint in enumerate(new_fingerprints):
+        if remaining[fingerprint] > 0:
+            remaining[fingerprint] -= 1
+        else:
+            changed.append(i)
+    removed = sum(remaining.values())
+    return changed, removed
+
+def overlap(old_fingerprints: list, new_fingerprints: list) -> float:
+    if not old_fingerprints or not new_fingerprints:
+        return 0.0
+    shared = sum((Counter(old_fingerprints) & Counter(new_fingerprints)).values())
+    return shared / max(len(old_fingerprints), len(new_fingerprints))
+
+def is_match(old_fingerprints: list, new_fingerprints: list) -> bool:
+    """
+    Whether two fingerprint lists look like versions of the same document. Blank
+    and repeated pages say little about identity, so enough distinct non-blank
+    pages must be shared as well as a large enough share of all pages.
+    """
+    shared = (set(old_fingerprints) & set(new_fingerprints)) - {EMPTY_PAGE}
+    return len(shared) >= MIN_MATCHED_PAGES and overlap(old_fingerprints, new_fingerprints) >= MATCH_THRESHOLD
@@ -0,0 +1,49 @@
+"""
+Fire concurrent chat sessions at the /chat endpoint and report latency.
+
+Start the backend against the stub LLM first:
+
+    CHAT_STUB_LLM=1 python server.py
+    python loadtest_chat.py --sessions 50 --turns 3
+"""
+import argparse
+import time
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+QUESTIONS = [
+    "What is a non-disclosure agreement?",
+    "How do index funds work?",
+    "Why is the sky blue?",
+]
+
+def run_session(endpoint: str, turns: int) -> list:
+    latencies = []
+    session_id = None
+    for turn in range(turns):
+        start = time.perf_counter()
+        response = requests.post(endpoint, json={"message": QUESTIONS[turn % len(QUESTIONS)], "session_id": session_id})
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+        session_id = response.json()["session_id"]
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the /chat endpoint")
+    parser.add_argument("--endpoint", default="http://localhost:8000/chat")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Messages sent per session")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        results = list(executor.map(lambda _: run_session(args.endpoint, args.turns), range(args.sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for session in results for latency in session)
+    print(f"Requests: {len(latencies)} in {elapsed:.2f}s ({len(latencies) / elapsed:.1f} req/s)")
+    print(f"Latency p50: {statistics.median(latencies):.3f}s  p95: {latencies[int(len(latencies) * 0.95) - 1]:.3f}s  max: {latencies[-1]:.3f}s")
+
+if __name__ == "__main__":
+    main()
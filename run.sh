@@ -5,7 +5,7 @@ cd "$(dirname "$0")"
 
 # Start the backend server
 echo "Starting the backend server..."
-nohup python server.py > server.log 2>&1 &
+CHAT_ENABLED=0 nohup python server.py > server.log 2>&1 &
 BACKEND_PID=$!
 echo "Backend server started with PID $BACKEND_PID"
 
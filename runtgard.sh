@@ -3,18 +3,55 @@
 # Navigate to the project root directory
 cd "$(dirname "$0")"
 
+# Refuse to start if another backend (e.g. from run.sh) already holds the port
+if curl -s -o /dev/null http://localhost:8000/; then
+    echo "Port 8000 is already in use. Stop the other backend first (./stop.sh or ./stopgard.sh)."
+    exit 1
+fi
+
+# Start the backend server (hosts the /chat API)
+echo "Starting the backend server..."
+nohup python server.py > server.log 2>&1 &
+BACKEND_PID=$!
+echo "Backend server started with PID $BACKEND_PID"
+
+# Wait for the backend server to build its rails pool. Uvicorn only starts
+# answering requests once startup has finished, so poll the chat health check.
+BACKEND_START_TIMEOUT=${BACKEND_START_TIMEOUT:-300}
+echo "Waiting for the backend server to be ready..."
+SECONDS=0
+until curl -sf -o /dev/null http://localhost:8000/health/chat; do
+    if ! ps -p $BACKEND_PID > /dev/null; then
+        echo "Backend server exited during startup. Check server.log for details."
+        exit 1
+    fi
+    if [ $SECONDS -ge $BACKEND_START_TIMEOUT ]; then
+        echo "Backend server did not respond within $BACKEND_START_TIMEOUT seconds. Check server.log for details."
+        kill $BACKEND_PID
+        exit 1
+    fi
+    sleep 1
+done
+if ! ps -p $BACKEND_PID > /dev/null; then
+    echo "Backend server exited during startup. Check server.log for details."
+    exit 1
+fi
+echo "Backend server is ready"
+
 # Start the Streamlit frontend on port 8001
 echo "Starting the Streamlit frontend..."
 nohup streamlit run demo.py --server.port 8001 > frontend.log 2>&1 &
 FRONTEND_PID=$!
 echo "Streamlit frontend started with PID $FRONTEND_PID"
 
-# Save the PID to a file for easy shutdown later
-echo $FRONTEND_PID > pid.txt
+# Save the PIDs to a file for easy shutdown later
+echo $BACKEND_PID > pid.txt
+echo $FRONTEND_PID >> pid.txt
 
-echo "The Streamlit process is now running in the background."
+echo "Both processes are now running in the background."
+echo "You can view the backend logs in server.log"
 echo "You can view the frontend logs in frontend.log"
-echo "To stop the process, run: ./stopgard.sh"
+echo "To stop the processes, run: ./stopgard.sh"
 
 # Display the Streamlit access link
 echo "Access the Streamlit frontend at: http://localhost:8001"
@@ -23,17 +60,18 @@ echo "Access the Streamlit frontend at: http://localhost:8001"
 cat << EOF > stopgard.sh
 #!/bin/bash
 if [ -f pid.txt ]; then
-  pid=\$(cat pid.txt)
-  if ps -p \$pid > /dev/null; then
-    echo "Stopping process \$pid"
-    kill \$pid
-  fi
+  while read pid; do
+    if ps -p \$pid > /dev/null; then
+      echo "Stopping process \$pid"
+      kill \$pid
+    fi
+  done < pid.txt
   rm pid.txt
-  echo "Process stopped"
+  echo "All processes stopped"
 else
-  echo "No pid.txt file found. Process may not be running."
+  echo "No pid.txt file found. Processes may not be running."
 fi
 EOF
 
 chmod +x stopgard.sh
-echo "A stop script has been created. Run ./stopgard.sh to stop the process."
+echo "A stop script has been created. Run ./stopgard.sh to stop the processes."
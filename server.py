@@ -1,13 +1,16 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from typing import List
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
 import os
+import hashlib
 import tempfile
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import CharacterTextSplitter
-from langchain_openai import  ChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
 import logging
+from pypdf import PdfReader
+from incremental import fingerprint_pages, extract_pages, diff_pages
+from analysis_store import AnalysisStore
+from analysis import (
+    MODEL_NAME, process_pdf, analyze_company, summarize_changes, merge_analysis, compare_companies
+)
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -15,86 +18,111 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
-#load openai api key from .env file
-from dotenv import load_dotenv
-load_dotenv()
-OPENAI_API_KEY=os.getenv("OPENAI_API_KEY")
-
-llm=ChatOpenAI(model="gpt-4-turbo",temperature=0,api_key=OPENAI_API_KEY)
-def process_pdf(file_path):
-    loader = PyPDFLoader(file_path)
-    documents = loader.load()
-    text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=0)
-    texts = text_splitter.split_documents(documents)
-    return texts
-
-def analyze_company(company_name: str, company_data: str) -> str:
-    prompt = PromptTemplate(
-        input_variables=["company_name", "company_data"],
-        template="""
-Analyze the following data for {company_name}. Provide a concise summary covering:
-1. Financial Performance
-2. Market Position
-3. Operational Efficiency
-4. Innovation and R&D
-5. Key Strengths and Weaknesses
-
-Data:
-{company_data}
-
-Provide a brief analysis in the following markdown table format:
-
-| Category | Analysis |
-| --- | --- |
-| Financial Performance | (analysis here) |
-| Market Position | (analysis here) |
-| Operational Efficiency | (analysis here) |
-| Innovation and R&D | (analysis here) |
-| Key Strengths | (analysis here) |
-| Key Weaknesses | (analysis here) |
-
-Ensure that the table is properly formatted with the | character at the start and end of each row, and that the separator row (| --- | --- |) is included.
-
-Analysis:
-"""
-    )
-    chain = LLMChain(llm=llm, prompt=prompt)
-    return chain.run(company_name=company_name, company_data=company_data[:100000])  # Limit input to 100k characters
-
-def compare_companies(company_analyses: dict) -> str:
-    prompt = PromptTemplate(
-        input_variables=["analyses"],
-        template="""
-Compare the following companies based on their individual analyses:
-
-{analyses}
-
-Provide a comprehensive comparative analysis in the following markdown table format:
-
-| Category | Company A  | Company B | Company C | Company D |
-| Financial Performance | (analysis) | (analysis) | (analysis) | (analysis) |
-| Market Position | (analysis) | (analysis) | (analysis) | (analysis) |
-| Operational Efficiency | (analysis) | (analysis) | (analysis) | (analysis) |
-| Innovation and R&D | (analysis) | (analysis) | (analysis) | (analysis) |
-| Key Strengths | (analysis) | (analysis) | (analysis) | (analysis) |
-| Key Weaknesses | (analysis) | (analysis) | (analysis) | (analysis) |
-Ensure that the table is properly formatted with the | character at the start and end of each row, and that the separator row (| --- | --- | --- | --- | --- |) is included.
-
-Then, provide strategic recommendations for (Company A) in a separate markdown table:
+# The chat API builds its rails pool at startup; run.sh turns it off for analysis-only use
+if os.getenv("CHAT_ENABLED", "1") == "1":
+    from chat_service import router as chat_router
+    app.include_router(chat_router)
+
+analysis_store = AnalysisStore()
+
+def analyze_document(company_name: str, file_path: str, source_name: str):
+    """
+    Analyze a report, reusing stored analyses where possible: an identical file
+    is served from the store, and a new version of a known document (one uploaded
+    before under the same file name) is only re-analyzed from its changed pages. Returns the analysis and a report of
+    what changed and how much work was skipped.
+    """
+    with open(file_path, "rb") as f:
+        document_hash = hashlib.sha256(f.read()).hexdigest()
+    report = {
+        "mode": "cached",
+        "analysis_id": None,
+        "matched_analysis": None,
+        "pages_total": 0,
+        "pages_changed": 0,
+        "pages_removed": 0,
+        "pages_skipped": 0,
+        "changes": None,
+    }
+
+    cached = analysis_store.find_by_hash(document_hash, MODEL_NAME, company_name)
+    if cached is not None:
+        report.update({
+            "analysis_id": cached["id"],
+            "matched_analysis": cached["id"],
+            "pages_total": cached["page_count"],
+            "pages_skipped": cached["page_count"],
+        })
+        return cached["analysis"], report
 
-| Recommendation | Description |
-| Recommendation 1 | (description) |
-| Recommendation 2 | (description) |
-| Recommendation 3 | (description) |
-
-Again, ensure that this table is properly formatted with the | character at the start and end of each row, and that the separator row (| --- | --- |) is included.
-
-Comparative Analysis:
-"""
+    try:
+        reader = PdfReader(file_path)
+        fingerprints = fingerprint_pages(reader)
+    except Exception as e:
+        # Without fingerprints the report cannot be matched, so analyze it in full
+        logger.warning(f"Could not fingerprint {source_name}, analyzing in full: {str(e)}")
+        fingerprints = []
+    previous = analysis_store.find_by_fingerprints(fingerprints, MODEL_NAME, source_name)
+
+    if previous is None:
+        texts = process_pdf(file_path)
+        report.update({"mode": "full", "pages_total": len(texts), "pages_changed": len(texts)})
+        analysis = analyze_company(company_name, "\n".join([doc.page_content for doc in texts]))
+        report["analysis_id"] = analysis_store.save_analysis(
+            company_name, document_hash, MODEL_NAME, fingerprints, analysis, source_name=source_name
+        )
+        return analysis, report
+
+    changed, removed = diff_pages(previous["fingerprints"], fingerprints)
+    report.update({
+        "pages_total": len(fingerprints),
+        "matched_analysis": previous["id"],
+        "pages_changed": len(changed),
+        "pages_removed": removed,
+        "pages_skipped": len(fingerprints) - len(changed),
+    })
+    if not changed and not removed:
+        report["mode"] = "unchanged"
+        analysis = previous["analysis"]
+    else:
+        logger.debug(f"Re-extracting {len(changed)} of {len(fingerprints)} pages for {company_name}...")
+        report["mode"] = "delta"
+        report["changes"] = summarize_changes(company_name, extract_pages(reader, changed), removed)
+        analysis = merge_analysis(company_name, previous["analysis"], report["changes"])
+    report["analysis_id"] = analysis_store.save_analysis(
+        company_name, document_hash, MODEL_NAME, fingerprints, analysis, previous["document_id"], source_name
     )
-    analyses_text = "\n\n".join([f"{name}:\n{analysis}" for name, analysis in company_analyses.items()])
-    chain = LLMChain(llm=llm, prompt=prompt)
-    return chain.run(analyses=analyses_text)
+    return analysis, report
+
+def run_analysis(company_files: dict) -> dict:
+    """
+    Analyze each company's report and compare them. company_files maps each
+    company name to the path of its saved upload and the uploaded file name.
+    """
+    logger.debug("Analyzing individual companies...")
+    company_analyses = {}
+    incremental_reports = {}
+    for company_name, (file_path, source_name) in company_files.items():
+        company_analyses[company_name], incremental_reports[company_name] = analyze_document(company_name, file_path, source_name)
+
+    analysis_ids = {name: report["analysis_id"] for name, report in incremental_reports.items()}
+    comparison = analysis_store.find_comparison(analysis_ids, MODEL_NAME)
+    if comparison is not None:
+        logger.debug("Reusing stored comparative analysis...")
+        comparison_id = comparison["id"]
+        comparative_analysis = comparison["comparative_analysis"]
+    else:
+        logger.debug("Performing comparative analysis...")
+        comparative_analysis = compare_companies(company_analyses)
+        comparison_id = analysis_store.save_comparison(analysis_ids, MODEL_NAME, comparative_analysis)
+
+    return {
+        "message": "Analysis completed successfully",
+        "comparison_id": comparison_id,
+        "individual_analyses": company_analyses,
+        "comparative_analysis": comparative_analysis,
+        "incremental": incremental_reports
+    }
 
 @app.post("/analyze-companies/")
 async def analyze_companies(
@@ -103,41 +131,87 @@ async def analyze_companies(
     if len(files) != 4:
         raise HTTPException(status_code=400, detail="Exactly 4 PDF files are required")
 
-    company_data = {}
+    company_files = {}
     company_names = ["Company A ", "Company B", "Company C", "Company D"]
 
-    # Process PDF files
-    for file, company_name in zip(files, company_names):
+    for file in files:
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail=f"File {file.filename} must be a PDF")
 
+    # Save uploaded PDF files
+    for file, company_name in zip(files, company_names):
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_file:
             content = await file.read()
             temp_file.write(content)
-            temp_file_path = temp_file.name
-
-        texts = process_pdf(temp_file_path)
-        company_data[company_name] = "\n".join([doc.page_content for doc in texts])
-
-        os.unlink(temp_file_path)
+            company_files[company_name] = (temp_file.name, os.path.basename(file.filename))
 
     try:
-        logger.debug("Analyzing individual companies...")
-        company_analyses = {}
-        for company_name, data in company_data.items():
-            company_analyses[company_name] = analyze_company(company_name, data)
-        
-        logger.debug("Performing comparative analysis...")
-        comparative_analysis = compare_companies(company_analyses)
-
-        return {
-            "message": "Analysis completed successfully",
-            "individual_analyses": company_analyses,
-            "comparative_analysis": comparative_analysis
-        }
+        # The analysis makes minutes of blocking LLM, PDF and sqlite calls, so it runs
+        # in the threadpool to keep the event loop (shared with /chat) responsive
+        return await run_in_threadpool(run_analysis, company_files)
     except Exception as e:
         logger.error(f"Error during analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error during analysis: {str(e)}")
+    finally:
+        for file_path, _ in company_files.values():
+            os.unlink(file_path)
+
+@app.get("/analyses/")
+def list_analyses(
+    company_name: Optional[str] = None,
+    source_name: Optional[str] = None,
+    document_hash: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    total, items = analysis_store.list_analyses(company_name, source_name, document_hash, model, since, until, limit, offset)
+    return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+@app.get("/analyses/search")
+def search_analyses(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    total, items = analysis_store.search_analyses(q, limit, offset)
+    return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+@app.get("/analyses/{analysis_id}")
+def get_analysis(analysis_id: int):
+    analysis = analysis_store.get_analysis(analysis_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail=f"Analysis {analysis_id} not found")
+    return analysis
+
+@app.get("/comparisons/")
+def list_comparisons(
+    model: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    total, items = analysis_store.list_comparisons(model, since, until, limit, offset)
+    return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+@app.get("/comparisons/search")
+def search_comparisons(
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    total, items = analysis_store.search_comparisons(q, limit, offset)
+    return {"total": total, "limit": limit, "offset": offset, "items": items}
+
+@app.get("/comparisons/{comparison_id}")
+def get_comparison(comparison_id: int):
+    comparison = analysis_store.get_comparison(comparison_id)
+    if comparison is None:
+        raise HTTPException(status_code=404, detail=f"Comparison {comparison_id} not found")
+    return comparison
 
 if __name__ == "__main__":
     import uvicorn